@@ -3,6 +3,7 @@ Configuration management for Telegram Trading Bot
 """
 
 import os
+import secrets
 from typing import Optional
 
 class Config:
@@ -16,8 +17,48 @@ class Config:
         self.API_ID = int(os.getenv('API_ID', '0'))
         self.API_HASH = os.getenv('API_HASH', '')
         
+        # Low-memory mode for constrained devices such as Termux on Android
+        self.LOW_MEMORY = os.getenv('LOW_MEMORY', 'false').lower() in ('1', 'true', 'yes')
+        self.FSM_MAX_USERS = int(os.getenv('FSM_MAX_USERS', '500' if self.LOW_MEMORY else '10000'))
+        
         # Database Configuration
         self.DATABASE_NAME = os.getenv('DATABASE_NAME', 'telegram_accounts.db')
+        self.PHONE_CLAIM_TIMEOUT_MINUTES = int(os.getenv('PHONE_CLAIM_TIMEOUT_MINUTES', '15'))
+        
+        # Backup Configuration
+        self.BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+        self.BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+        self.BACKUP_INTERVAL_HOURS = int(os.getenv('BACKUP_INTERVAL_HOURS', '6'))
+        self.BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+        
+        # Update scheduling: parallel users, one update at a time per user
+        self.UPDATE_SCHEDULER_ENABLED = os.getenv('UPDATE_SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '8' if self.LOW_MEMORY else '32'))
+        self.UPDATE_USER_QUEUE = int(os.getenv('UPDATE_USER_QUEUE', '5'))
+        
+        # Priority lanes: reserved slots for the admin, a small bounded lane for reports
+        self.UPDATE_HIGH_CONCURRENCY = int(os.getenv('UPDATE_HIGH_CONCURRENCY', '4'))
+        self.UPDATE_LOW_CONCURRENCY = int(os.getenv('UPDATE_LOW_CONCURRENCY', '2'))
+        self.UPDATE_LOW_QUEUE = int(os.getenv('UPDATE_LOW_QUEUE', '10'))
+        # Stateless commands registered in handlers/admin.py; only these skip per-user ordering
+        self.ADMIN_COMMANDS = {
+            'user_accounts', 'mark_paid', 'mark_paid_batch', 'completed_today_payment', 'stats',
+            'throttle_stats', 'profile', 'loop_stats', 'memory', 'find', 'queue_stats',
+        }
+        self.LOW_PRIORITY_COMMANDS = {
+            'find', 'profile', 'loop_stats', 'memory', 'throttle_stats', 'queue_stats',
+        }
+        
+        # Event loop monitoring
+        self.LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.5'))
+        self.LOOP_LAG_THRESHOLD_MS = int(os.getenv('LOOP_LAG_THRESHOLD_MS', '250'))
+        self.LOOP_MONITOR_SAMPLES = int(os.getenv('LOOP_MONITOR_SAMPLES', '300' if self.LOW_MEMORY else '1200'))
+        
+        # Update recording (opt-in): anonymized gzip JSONL for replay tests, one
+        # timestamped file per run next to RECORD_UPDATES_PATH
+        self.RECORD_UPDATES_PATH = os.getenv('RECORD_UPDATES_PATH', '')
+        self.RECORD_SALT = os.getenv('RECORD_SALT', '') or secrets.token_hex(16)
         
         # Bot Settings
         self.ACCOUNT_PASSWORD = os.getenv('ACCOUNT_PASSWORD', 'Bashir@111#')
@@ -27,6 +68,23 @@ class Config:
         self.OPEN_HOUR = 8   # 8:00 AM
         self.CLOSE_HOUR = 22  # 10:00 PM
         
+        # Throttling (token buckets: rate in requests/second, burst in requests)
+        self.THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', '1'))
+        self.THROTTLE_BURST = float(os.getenv('THROTTLE_BURST', '5'))
+        self.THROTTLE_GLOBAL_RATE = float(os.getenv('THROTTLE_GLOBAL_RATE', '30'))
+        self.THROTTLE_GLOBAL_BURST = float(os.getenv('THROTTLE_GLOBAL_BURST', '60'))
+        self.THROTTLE_MAX_USERS = int(os.getenv('THROTTLE_MAX_USERS', '2000' if self.LOW_MEMORY else '10000'))
+        self.THROTTLE_IDLE_TTL = float(os.getenv('THROTTLE_IDLE_TTL', '600'))
+        self.THROTTLE_NOTIFY_INTERVAL = float(os.getenv('THROTTLE_NOTIFY_INTERVAL', '30'))
+        # Stricter limits for commands that hit the database hardest
+        self.THROTTLE_COMMAND_LIMITS = {
+            'start': (0.2, 3),
+            'myaccounts': (0.1, 2),
+            'withdraw': (0.05, 2),
+            'withdrawals': (0.2, 3),
+        }
+        
         # Validate configuration
         self._validate_config()
         
@@ -40,6 +98,8 @@ class Config:
             raise ValueError("API_ID environment variable is required")
         if not self.API_HASH:
             raise ValueError("API_HASH environment variable is required")
+        if self.BACKUP_KEEP < 1:
+            raise ValueError("BACKUP_KEEP must be at least 1")
             
     def is_admin(self, user_id: int) -> bool:
         """Check if user is admin"""
@@ -2,21 +2,114 @@
 Database management for Telegram Trading Bot
 """
 
+import re
+import time
 import aiosqlite
 import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on phone numbers remembered as already registered
+KNOWN_PHONES_CACHE_SIZE = 10000
+LOW_MEMORY_KNOWN_PHONES_CACHE_SIZE = 1000
+
+# Shortest search term served by the FTS5 prefix index (prefix='2 3 4')
+SEARCH_MIN_TERM_LENGTH = 2
+
+# Pending claims older than this are treated as abandoned and may be taken over
+PHONE_CLAIM_TIMEOUT_MINUTES = 15
+
+class AccountRow:
+    """Compact account row used in low-memory mode, readable like the dict rows"""
+    __slots__ = ("phone", "status", "created_at")
+    
+    def __init__(self, phone: str, status: str, created_at: str):
+        self.phone = phone
+        self.status = status
+        self.created_at = created_at
+        
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+        
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+def _account_dict(phone: str, status: str, created_at: str) -> Dict:
+    return {"phone": phone, "status": status, "created_at": created_at}
+
+MEMORY_DB_NAME = ':memory:'
+
 class Database:
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, seed_from: Optional[str] = None, low_memory: bool = False):
         self.db_name = db_name
+        # Low-memory mode returns slotted rows and keeps smaller caches
+        self.low_memory = low_memory
+        self._account_row = AccountRow if low_memory else _account_dict
+        self._known_phones_limit = LOW_MEMORY_KNOWN_PHONES_CACHE_SIZE if low_memory else KNOWN_PHONES_CACHE_SIZE
+        # Negative cache: phone number -> owner info for numbers that are taken
+        self._known_phones: "OrderedDict[str, Dict]" = OrderedDict()
+        
+        # In-memory mode keeps one connection open for the lifetime of the object,
+        # optionally seeded from an on-disk database file
+        self.in_memory = db_name == MEMORY_DB_NAME
+        self.seed_from = seed_from
+        self._shared_db: Optional[aiosqlite.Connection] = None
+        self._shared_lock = asyncio.Lock()
+        
+    @asynccontextmanager
+    async def _connect(self):
+        """Yield a connection: a fresh one on disk, the shared one in memory"""
+        if not self.in_memory:
+            async with aiosqlite.connect(self.db_name) as db:
+                yield db
+            return
+        
+        # Callers share a single connection, so serialize their transactions
+        async with self._shared_lock:
+            if self._shared_db is None:
+                self._shared_db = await aiosqlite.connect(MEMORY_DB_NAME)
+                if self.seed_from:
+                    async with aiosqlite.connect(self.seed_from) as source:
+                        await source.backup(self._shared_db)
+                    logger.info(f"In-memory database seeded from {self.seed_from}")
+            try:
+                yield self._shared_db
+            except BaseException:
+                await self._shared_db.rollback()
+                raise
+                
+    async def snapshot_to(self, path: str, pages: int = -1, sleep: float = 0.25):
+        """Copy the current database into a file using SQLite's backup API
+        
+        With ``pages`` > 0 the copy runs in steps of that many pages, pausing
+        ``sleep`` seconds between steps so writers are not locked out. The pause
+        happens in aiosqlite's worker thread, so the event loop keeps running.
+        """
+        def pause(status: int, remaining: int, total: int):
+            # sqlite3 only sleeps on its own when a step hits a busy source
+            if remaining:
+                time.sleep(sleep)
+                
+        async with self._connect() as db:
+            async with aiosqlite.connect(path) as target:
+                await db.backup(target, pages=pages, progress=pause if pages > 0 else None, sleep=sleep)
+        logger.info(f"Database snapshot written to {path}")
+        
+    async def integrity_check(self) -> bool:
+        """Run SQLite's integrity check on the database"""
+        async with self._connect() as db:
+            cursor = await db.execute('PRAGMA integrity_check')
+            row = await cursor.fetchone()
+            return bool(row) and row[0] == 'ok'
         
     async def init_db(self):
         """Initialize database tables"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             # User accounts table
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS user_accounts (
@@ -58,6 +151,12 @@ class Database:
                 )
             ''')
             
+            # Per-user withdrawal history, newest first (keyset pagination)
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_withdrawal_requests_user_created
+                ON withdrawal_requests (user_id, created_at DESC, id DESC)
+            ''')
+            
             # Account sessions table
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS account_sessions (
@@ -83,47 +182,152 @@ class Database:
                 VALUES ('accounts_open', 'true')
             ''')
             
+            await self._init_search_index(db)
+            
             await db.commit()
             logger.info("Database initialized successfully")
             
-    async def add_user_account(self, user_id: int, username: str, phone_number: str) -> bool:
-        """Add a new user account"""
-        try:
-            async with aiosqlite.connect(self.db_name) as db:
-                await db.execute('''
-                    INSERT INTO user_accounts (user_id, username, phone_number, status)
-                    VALUES (?, ?, ?, 'pending')
-                ''', (user_id, username, phone_number))
-                await db.commit()
-                return True
-        except aiosqlite.IntegrityError:
-            return False  # Phone number already exists
-        except Exception as e:
-            logger.error(f"Error adding user account: {e}")
-            return False
-            
-    async def check_phone_exists(self, phone_number: str) -> bool:
-        """Check if phone number already exists"""
-        async with aiosqlite.connect(self.db_name) as db:
+    async def _init_search_index(self, db: aiosqlite.Connection):
+        """Create the admin search index and the triggers that keep it in sync
+        
+        The FTS5 rowid is the account id for user_accounts rows and the negated
+        request id for withdrawal_requests rows, so updates and deletes touch
+        the index by rowid instead of scanning it.
+        """
+        cursor = await db.execute('''
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'
+        ''')
+        exists = await cursor.fetchone() is not None
+        
+        await db.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                user_id UNINDEXED,
+                content,
+                prefix = '2 3 4'
+            )
+        ''')
+        
+        await db.executescript('''
+            CREATE TRIGGER IF NOT EXISTS search_accounts_insert AFTER INSERT ON user_accounts BEGIN
+                INSERT INTO search_index (rowid, user_id, content)
+                VALUES (new.id, new.user_id, new.phone_number || ' ' || coalesce(new.username, ''));
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_accounts_delete AFTER DELETE ON user_accounts BEGIN
+                DELETE FROM search_index WHERE rowid = old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_accounts_update
+            AFTER UPDATE OF user_id, username, phone_number ON user_accounts BEGIN
+                DELETE FROM search_index WHERE rowid = old.id;
+                INSERT INTO search_index (rowid, user_id, content)
+                VALUES (new.id, new.user_id, new.phone_number || ' ' || coalesce(new.username, ''));
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS search_withdrawals_insert AFTER INSERT ON withdrawal_requests BEGIN
+                INSERT INTO search_index (rowid, user_id, content)
+                VALUES (-new.id, new.user_id, coalesce(new.username, '') || ' ' || new.bank_details);
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_withdrawals_delete AFTER DELETE ON withdrawal_requests BEGIN
+                DELETE FROM search_index WHERE rowid = -old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_withdrawals_update
+            AFTER UPDATE OF user_id, username, bank_details ON withdrawal_requests BEGIN
+                DELETE FROM search_index WHERE rowid = -old.id;
+                INSERT INTO search_index (rowid, user_id, content)
+                VALUES (-new.id, new.user_id, coalesce(new.username, '') || ' ' || new.bank_details);
+            END;
+        ''')
+        
+        if not exists:
+            # Index rows that were written before search existed
+            await db.execute('''
+                INSERT INTO search_index (rowid, user_id, content)
+                SELECT id, user_id, phone_number || ' ' || coalesce(username, '') FROM user_accounts
+            ''')
+            await db.execute('''
+                INSERT INTO search_index (rowid, user_id, content)
+                SELECT -id, user_id, coalesce(username, '') || ' ' || bank_details FROM withdrawal_requests
+            ''')
+            logger.info("Search index built")
+            
+    def _remember_phone(self, phone_number: str, owner: Dict):
+        """Remember a taken phone number in the bounded negative cache"""
+        self._known_phones[phone_number] = owner
+        self._known_phones.move_to_end(phone_number)
+        if len(self._known_phones) > self._known_phones_limit:
+            self._known_phones.popitem(last=False)
+            
+    async def claim_phone_number(self, user_id: int, username: str, phone_number: str,
+                                 timeout_minutes: int = PHONE_CLAIM_TIMEOUT_MINUTES) -> Dict:
+        """Atomically claim a phone number for a user.
+        
+        Returns a dict with ``claimed`` (True when the number now belongs to this
+        user as a pending account) plus the owner's ``user_id``, ``status`` and
+        ``created_at``. A pending claim by the same user is handed back to them so
+        an interrupted submission can be resumed, and a pending claim left idle
+        for ``timeout_minutes`` is taken over by the new user.
+        """
+        known = self._known_phones.get(phone_number)
+        if known is not None:
+            self._known_phones.move_to_end(phone_number)
+            return {"claimed": False, **known}
+        
+        async with self._connect() as db:
             cursor = await db.execute('''
-                SELECT COUNT(*) FROM user_accounts WHERE phone_number = ?
-            ''', (phone_number,))
-            count = await cursor.fetchone()
-            return count[0] > 0
+                INSERT INTO user_accounts (user_id, username, phone_number, status)
+                VALUES (?, ?, ?, 'pending')
+                ON CONFLICT(phone_number) DO UPDATE SET
+                    user_id = excluded.user_id,
+                    username = excluded.username,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE user_accounts.status = 'pending'
+                  AND (user_accounts.user_id = excluded.user_id
+                       OR user_accounts.updated_at < datetime('now', ?))
+                RETURNING user_id, status, created_at
+            ''', (user_id, username, phone_number, f'-{timeout_minutes} minutes'))
+            row = await cursor.fetchone()
+            if row is None:
+                # The conflicting row belongs to someone else, so nothing was returned
+                cursor = await db.execute('''
+                    SELECT user_id, status, created_at FROM user_accounts WHERE phone_number = ?
+                ''', (phone_number,))
+                row = await cursor.fetchone()
+            await db.commit()
             
-    async def update_account_status(self, phone_number: str, status: str):
-        """Update account status"""
-        async with aiosqlite.connect(self.db_name) as db:
+        owner = {"user_id": row[0], "status": row[1], "created_at": row[2]}
+        claimed = owner["user_id"] == user_id and owner["status"] == 'pending'
+        # Pending claims may still be released, so only cache settled accounts
+        if not claimed and owner["status"] != 'pending':
+            self._remember_phone(phone_number, owner)
+        return {"claimed": claimed, **owner}
+        
+    async def release_phone_claim(self, user_id: int, phone_number: str):
+        """Release a pending phone number claim that did not complete"""
+        self._known_phones.pop(phone_number, None)
+        async with self._connect() as db:
             await db.execute('''
+                DELETE FROM user_accounts 
+                WHERE phone_number = ? AND user_id = ? AND status = 'pending'
+            ''', (phone_number, user_id))
+            await db.commit()
+            
+    async def complete_phone_claim(self, user_id: int, phone_number: str) -> bool:
+        """Mark a user's pending claim as a successful account
+        
+        Returns False when the claim is no longer theirs, e.g. it went stale and
+        another user took the number over while the OTP flow was running.
+        """
+        async with self._connect() as db:
+            cursor = await db.execute('''
                 UPDATE user_accounts 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE phone_number = ?
-            ''', (status, phone_number))
+                SET status = 'successful', updated_at = CURRENT_TIMESTAMP
+                WHERE phone_number = ? AND user_id = ? AND status = 'pending'
+            ''', (phone_number, user_id))
             await db.commit()
+            return cursor.rowcount > 0
             
     async def get_user_accounts(self, user_id: int) -> List[Dict]:
         """Get all accounts for a user"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT phone_number, status, created_at 
                 FROM user_accounts 
@@ -131,11 +335,28 @@ class Database:
                 ORDER BY created_at DESC
             ''', (user_id,))
             rows = await cursor.fetchall()
-            return [{"phone": row[0], "status": row[1], "created_at": row[2]} for row in rows]
+            return [self._account_row(*row) for row in rows]
+            
+    async def iter_user_accounts(self, user_id: int, limit: Optional[int] = None):
+        """Stream a user's newest accounts (all of them when ``limit`` is None)
+        
+        In in-memory mode the shared connection stays locked while iterating,
+        so do not call other Database methods from inside the loop.
+        """
+        async with self._connect() as db:
+            async with db.execute('''
+                SELECT phone_number, status, created_at 
+                FROM user_accounts 
+                WHERE user_id = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (user_id, -1 if limit is None else limit)) as cursor:
+                async for row in cursor:
+                    yield self._account_row(*row)
             
     async def get_user_account_count(self, user_id: int) -> int:
         """Get count of successful accounts for a user"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT COUNT(*) FROM user_accounts 
                 WHERE user_id = ? AND status = 'successful'
@@ -145,7 +366,7 @@ class Database:
             
     async def get_user_phone_numbers(self, user_id: int) -> List[str]:
         """Get all phone numbers for a user"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT phone_number FROM user_accounts 
                 WHERE user_id = ? AND status = 'successful'
@@ -155,7 +376,7 @@ class Database:
             
     async def set_user_state(self, user_id: int, state: str, data: str = None):
         """Set user conversation state"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO user_states (user_id, state, data)
                 VALUES (?, ?, ?)
@@ -164,7 +385,7 @@ class Database:
             
     async def get_user_state(self, user_id: int) -> Optional[Dict]:
         """Get user conversation state"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT state, data FROM user_states WHERE user_id = ?
             ''', (user_id,))
@@ -173,22 +394,123 @@ class Database:
             
     async def clear_user_state(self, user_id: int):
         """Clear user conversation state"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             await db.execute('DELETE FROM user_states WHERE user_id = ?', (user_id,))
             await db.commit()
             
     async def add_withdrawal_request(self, user_id: int, username: str, account_count: int, bank_details: str):
         """Add withdrawal request"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT INTO withdrawal_requests (user_id, username, account_count, bank_details)
                 VALUES (?, ?, ?, ?)
             ''', (user_id, username, account_count, bank_details))
             await db.commit()
             
+    async def get_user_withdrawal_requests(self, user_id: int, limit: int = 10,
+                                           before_id: Optional[int] = None) -> List[Dict]:
+        """Get a page of a user's withdrawal requests, newest first
+        
+        Pass the id of the last request on the previous page as ``before_id``
+        to fetch the next page; only the requested rows are read.
+        """
+        async with self._connect() as db:
+            if before_id is None:
+                cursor = await db.execute('''
+                    SELECT id, account_count, bank_details, status, created_at, processed_at
+                    FROM withdrawal_requests
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', (user_id, limit))
+            else:
+                cursor = await db.execute('''
+                    SELECT id, account_count, bank_details, status, created_at, processed_at
+                    FROM withdrawal_requests
+                    WHERE user_id = ? AND (created_at, id) < (
+                        SELECT created_at, id FROM withdrawal_requests WHERE id = ? AND user_id = ?
+                    )
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', (user_id, before_id, user_id, limit))
+            rows = await cursor.fetchall()
+            return [
+                {
+                    "id": row[0],
+                    "account_count": row[1],
+                    "bank_details": row[2],
+                    "status": row[3],
+                    "created_at": row[4],
+                    "processed_at": row[5],
+                }
+                for row in rows
+            ]
+            
+    async def _settle_withdrawal_requests(self, db: aiosqlite.Connection, user_id: int):
+        """Mark a user's pending withdrawal requests as paid once their accounts are all paid
+        
+        A request's ``account_count`` is the user's total of successful accounts
+        when it was made (paid ones included), so it is settled once that many
+        of the user's accounts have been paid.
+        """
+        await db.execute('''
+            UPDATE withdrawal_requests 
+            SET status = 'paid', processed_at = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND status = 'pending' AND account_count <= (
+                SELECT COUNT(*) FROM user_accounts 
+                WHERE user_id = ? AND status = 'successful' AND payment_status = 'paid'
+            )
+        ''', (user_id, user_id))
+            
+    async def search(self, query: str, before: Optional[int] = None,
+                     page_size: int = 10) -> Tuple[List[Dict], Optional[int]]:
+        """Prefix search over phone numbers, usernames and bank details
+        
+        Matches come in index rowid order rather than by relevance, because
+        ranking has to score every match and a short prefix such as a country
+        code matches most rows. Returns one page and the ``before`` cursor for
+        the next page, or None on the last page. Terms shorter than
+        SEARCH_MIN_TERM_LENGTH are ignored since the prefix index skips them.
+        """
+        terms = [term for term in re.findall(r'\w+', query) if len(term) >= SEARCH_MIN_TERM_LENGTH]
+        if not terms:
+            return [], None
+        match = ' '.join(f'"{term}"*' for term in terms)
+        
+        async with self._connect() as db:
+            cursor = await db.execute('''
+                SELECT s.rowid, s.user_id,
+                       a.phone_number, a.username, a.status, a.payment_status,
+                       w.username, w.bank_details, w.status, w.created_at
+                FROM (
+                    SELECT rowid, user_id FROM search_index
+                    WHERE search_index MATCH ? AND rowid < ?
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                ) s
+                LEFT JOIN user_accounts a ON s.rowid > 0 AND a.id = s.rowid
+                LEFT JOIN withdrawal_requests w ON s.rowid < 0 AND w.id = -s.rowid
+                ORDER BY s.rowid DESC
+            ''', (match, 2**63 - 1 if before is None else before, page_size + 1))
+            rows = await cursor.fetchall()
+            
+        results = []
+        for row in rows[:page_size]:
+            if row[0] > 0:
+                results.append({
+                    "kind": "account", "id": row[0], "user_id": row[1],
+                    "phone": row[2], "username": row[3], "status": row[4], "payment_status": row[5],
+                })
+            else:
+                results.append({
+                    "kind": "withdrawal", "id": -row[0], "user_id": row[1],
+                    "username": row[6], "bank_details": row[7], "status": row[8], "created_at": row[9],
+                })
+        return results, rows[page_size - 1][0] if len(rows) > page_size else None
+            
     async def get_accounts_open_status(self) -> bool:
         """Check if accounts are open for receiving"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT value FROM bot_settings WHERE key = 'accounts_open'
             ''', )
@@ -197,7 +519,7 @@ class Database:
             
     async def set_accounts_open_status(self, is_open: bool):
         """Set accounts open status"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO bot_settings (key, value, updated_at)
                 VALUES ('accounts_open', ?, CURRENT_TIMESTAMP)
@@ -206,7 +528,7 @@ class Database:
             
     async def get_stats(self) -> Dict:
         """Get bot statistics"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT status, COUNT(*) FROM user_accounts GROUP BY status
             ''')
@@ -215,18 +537,65 @@ class Database:
             
     async def mark_account_paid(self, user_id: int, account_count: int):
         """Mark accounts as paid"""
-        async with aiosqlite.connect(self.db_name) as db:
-            await db.execute('''
+        async with self._connect() as db:
+            cursor = await db.execute('''
                 UPDATE user_accounts 
                 SET payment_status = 'paid', updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ? AND status = 'successful' AND payment_status = 'unpaid'
-                LIMIT ?
+                WHERE id IN (
+                    SELECT id FROM user_accounts 
+                    WHERE user_id = ? AND status = 'successful' AND payment_status = 'unpaid'
+                    ORDER BY created_at
+                    LIMIT ?
+                )
             ''', (user_id, account_count))
+            if cursor.rowcount > 0:
+                await self._settle_withdrawal_requests(db, user_id)
             await db.commit()
             
+    async def mark_accounts_paid_batch(self, entries: List[Tuple[int, int]]) -> List[Dict]:
+        """Mark accounts as paid for many users in a single transaction
+        
+        Each entry is ``(user_id, account_count)``. At most the user's unpaid
+        successful accounts are marked; the result reports requested, unpaid
+        and paid counts per user so mismatches can be shown to the admin.
+        """
+        results = []
+        async with self._connect() as db:
+            try:
+                for user_id, account_count in entries:
+                    cursor = await db.execute('''
+                        SELECT COUNT(*) FROM user_accounts 
+                        WHERE user_id = ? AND status = 'successful' AND payment_status = 'unpaid'
+                    ''', (user_id,))
+                    unpaid = (await cursor.fetchone())[0]
+                    
+                    cursor = await db.execute('''
+                        UPDATE user_accounts 
+                        SET payment_status = 'paid', updated_at = CURRENT_TIMESTAMP
+                        WHERE id IN (
+                            SELECT id FROM user_accounts 
+                            WHERE user_id = ? AND status = 'successful' AND payment_status = 'unpaid'
+                            ORDER BY created_at
+                            LIMIT ?
+                        )
+                    ''', (user_id, account_count))
+                    results.append({
+                        "user_id": user_id,
+                        "requested": account_count,
+                        "unpaid": unpaid,
+                        "paid": cursor.rowcount,
+                    })
+                    if cursor.rowcount > 0:
+                        await self._settle_withdrawal_requests(db, user_id)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        return results
+            
     async def set_buyer_mapping(self, phone_number: str, buyer_user_id: int):
         """Set buyer mapping for an account"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             await db.execute('''
                 UPDATE user_accounts 
                 SET buyer_user_id = ?, updated_at = CURRENT_TIMESTAMP
@@ -236,7 +605,7 @@ class Database:
             
     async def get_buyer_by_phone(self, phone_number: str) -> Optional[int]:
         """Get buyer user ID by phone number"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT buyer_user_id FROM user_accounts WHERE phone_number = ?
             ''', (phone_number,))
@@ -245,7 +614,7 @@ class Database:
             
     async def save_session_data(self, phone_number: str, session_data: str):
         """Save session data for a phone number"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             await db.execute('''
                 INSERT OR REPLACE INTO account_sessions (phone_number, session_data)
                 VALUES (?, ?)
@@ -254,7 +623,7 @@ class Database:
             
     async def get_session_data(self, phone_number: str) -> Optional[str]:
         """Get session data for a phone number"""
-        async with aiosqlite.connect(self.db_name) as db:
+        async with self._connect() as db:
             cursor = await db.execute('''
                 SELECT session_data FROM account_sessions WHERE phone_number = ? AND is_active = TRUE
             ''', (phone_number,))
@@ -263,5 +632,7 @@ class Database:
             
     async def close(self):
         """Close database connections"""
-        # aiosqlite doesn't maintain persistent connections
-        pass
+        # On-disk mode opens a connection per call; only the in-memory one persists
+        if self._shared_db is not None:
+            await self._shared_db.close()
+            self._shared_db = None
@@ -2,15 +2,27 @@
 Admin command handlers
 """
 
+import io
+import re
+import csv
+import html
+import time
+import inspect
 import logging
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
 from aiogram import Router, types, F
 from aiogram.filters import Command
 
-from database import Database
+from database import Database, SEARCH_MIN_TERM_LENGTH
 from config import Config
 
+if TYPE_CHECKING:
+    # Optional components are imported by main.py only when enabled
+    from throttling import ThrottlingMiddleware
+    from loop_monitor import LoopMonitor
+    from update_scheduler import UpdateScheduler
+
 logger = logging.getLogger(__name__)
 
 router = Router()
@@ -66,6 +78,121 @@ async def mark_paid_command(message: types.Message, database: Database, config:
         f"An cire su daga jerin biyan da ake jira, an kuma sanya su a matsayin wanda aka biya."
     )
 
+MAX_MESSAGE_LENGTH = 4000
+PAYMENT_CSV_HEADER = ['user_id', 'count']
+
+async def _answer_in_chunks(message: types.Message, text: str):
+    """Send text as several messages, split by line, to stay under Telegram's limit"""
+    chunk = ""
+    for line in text.splitlines(keepends=True):
+        # A single oversized line is cut rather than rejected by Telegram
+        while len(line) > MAX_MESSAGE_LENGTH:
+            if chunk.strip():
+                await message.answer(chunk)
+                chunk = ""
+            await message.answer(line[:MAX_MESSAGE_LENGTH])
+            line = line[MAX_MESSAGE_LENGTH:]
+        if len(chunk) + len(line) > MAX_MESSAGE_LENGTH:
+            await message.answer(chunk)
+            chunk = ""
+        chunk += line
+    if chunk.strip():
+        await message.answer(chunk)
+
+def _parse_payment_entries(rows: List[List[str]]) -> Tuple[List[Tuple[int, int]], List[str]]:
+    """Parse and validate (user_id, count) rows, collecting every error"""
+    entries = []
+    errors = []
+    seen = set()
+    first_row = True
+    
+    for line_no, row in enumerate(rows, start=1):
+        cells = [cell.strip() for cell in row if cell.strip()]
+        if not cells:
+            continue
+        # Allow a "user_id,count" header as the first non-empty row
+        if first_row:
+            first_row = False
+            if [cell.lower() for cell in cells] == PAYMENT_CSV_HEADER:
+                continue
+        if len(cells) != 2:
+            errors.append(f"Layi {line_no}: ana bukatar [User ID] [Adadi]")
+            continue
+        try:
+            user_id = int(cells[0])
+            account_count = int(cells[1])
+        except ValueError:
+            errors.append(f"Layi {line_no}: User ID da adadi dole su zama lambobi")
+            continue
+        if account_count <= 0:
+            errors.append(f"Layi {line_no}: adadi dole ya fi 0")
+            continue
+        if user_id in seen:
+            errors.append(f"Layi {line_no}: User ID {user_id} ya maimaitu")
+            continue
+        seen.add(user_id)
+        entries.append((user_id, account_count))
+    
+    return entries, errors
+
+async def mark_paid_batch_command(message: types.Message, database: Database, config: Config):
+    """Handle /mark_paid_batch command (Admin only)
+    
+    Accepts one "User ID, Adadi" pair per line, starting on the command's own
+    line, or a CSV file sent with /mark_paid_batch as its caption.
+    """
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    if message.document:
+        try:
+            buffer = await message.bot.download(message.document)
+            text = buffer.getvalue().decode('utf-8-sig')
+        except Exception as e:
+            logger.error(f"Error downloading payment CSV: {e}")
+            await message.answer("Kuskure yayin karbar file din CSV.")
+            return
+        rows = list(csv.reader(io.StringIO(text)))
+    else:
+        # Entries may start on the command line itself, after /mark_paid_batch
+        lines = (message.text or "").splitlines()
+        if lines:
+            lines[0] = lines[0].strip().partition(' ')[2]
+        rows = [re.split(r'[\s,;]+', line) for line in lines]
+    
+    entries, errors = _parse_payment_entries(rows)
+    if errors:
+        await message.answer("Ba a biya kowa ba, gyara wadannan kurakurai:\n" + "\n".join(errors))
+        return
+    if not entries:
+        await message.answer(
+            "Amfani: /mark_paid_batch sannan kowane layi: [User ID] [Adadin Accounts]\n"
+            "Ko ka tura file din CSV tare da /mark_paid_batch a matsayin caption."
+        )
+        return
+    
+    try:
+        results = await database.mark_accounts_paid_batch(entries)
+    except Exception as e:
+        logger.error(f"Error marking batch payment: {e}")
+        await message.answer("Kuskure yayin yin alamar biya. Ba a canza komai ba.")
+        return
+    
+    total_paid = sum(result['paid'] for result in results)
+    mismatches = [result for result in results if result['paid'] != result['requested']]
+    
+    response = f"✅ An yi alamar biya don accounts guda {total_paid} na users {len(results)}.\n\n"
+    for result in results:
+        marker = "⚠️" if result['paid'] != result['requested'] else "•"
+        response += (
+            f"{marker} {result['user_id']}: an biya {result['paid']}/{result['requested']} "
+            f"(unpaid {result['unpaid']})\n"
+        )
+    if mismatches:
+        response += f"\n⚠️ Users {len(mismatches)} ba su da isassun accounts da ba a biya ba."
+    
+    await _answer_in_chunks(message, response)
+
 async def completed_today_payment_command(message: types.Message, database: Database, config: Config):
     """Handle /completed_today_payment command (Admin only)"""
     if not config.is_admin(message.from_user.id):
@@ -73,8 +200,7 @@ async def completed_today_payment_command(message: types.Message, database: Data
     
     # Send notification to channel
     try:
-        from aiogram import Bot
-        bot = Bot.get_current()
+        bot = message.bot
         
         await bot.send_message(
             config.CHANNEL_ID,
@@ -101,18 +227,204 @@ async def stats_command(message: types.Message, database: Database, config: Conf
     
     await message.answer(response, parse_mode="Markdown")
 
-async def register_handlers(dp, database: Database, config: Config):
+async def throttle_stats_command(message: types.Message, database: Database, config: Config,
+                                 throttling: Optional["ThrottlingMiddleware"] = None):
+    """Handle /throttle_stats command (Admin only)"""
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    if throttling is None:
+        await message.answer("Ba a kunna throttling ba.")
+        return
+    
+    stats = throttling.get_stats()
+    response = (
+        "🚦 Throttle Statistics:\n"
+        f"• An bari: {stats['allowed']}\n"
+        f"• An hana (user): {stats['throttled_user']}\n"
+        f"• An hana (global): {stats['throttled_global']}\n"
+        f"• Amsoshin da aka tura: {stats['replies']}\n"
+        f"• Buckets: {stats['tracked_buckets']}\n"
+    )
+    for command, count in sorted(stats['by_command'].items()):
+        response += f"• /{command}: {count}\n"
+    
+    await message.answer(response)
+
+async def profile_command(message: types.Message, database: Database, config: Config):
+    """Handle /profile command (Admin only)"""
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    # Imported lazily so cProfile/pstats are only loaded when profiling is used
+    from profiler import profiler, ProfilerBusyError, MAX_PROFILE_SECONDS
+    
+    parts = message.text.split()
+    try:
+        seconds = int(parts[1]) if len(parts) > 1 else 30
+    except ValueError:
+        await message.answer("Amfani: /profile [Seconds]")
+        return
+    
+    await message.answer(f"🔬 Ana profiling na bot na seconds {min(seconds, MAX_PROFILE_SECONDS)}...")
+    
+    try:
+        report, raw_profile = await profiler.run(seconds)
+    except ProfilerBusyError:
+        await message.answer("Ana riga ana profiling. Don Allah a jira ya kare.")
+        return
+    
+    # Leave room for HTML escaping within Telegram's message limit
+    summary = report if len(report) <= 3000 else report[:3000] + "\n..."
+    await message.answer(f"<pre>{html.escape(summary)}</pre>", parse_mode="HTML")
+    await message.answer_document(
+        types.BufferedInputFile(raw_profile, filename=f"profile_{int(time.time())}.prof"),
+        caption="Bude da: python -m pstats profile.prof"
+    )
+
+async def loop_stats_command(message: types.Message, database: Database, config: Config,
+                             loop_monitor: Optional["LoopMonitor"] = None):
+    """Handle /loop_stats command (Admin only)"""
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    if loop_monitor is None:
+        await message.answer("Ba a kunna loop monitor ba.")
+        return
+    
+    stats = loop_monitor.get_stats()
+    response = (
+        "⏱ Event Loop Lag:\n"
+        f"• Samples: {stats['samples']}\n"
+        f"• p50: {stats['p50_ms']:.1f}ms\n"
+        f"• p99: {stats['p99_ms']:.1f}ms\n"
+        f"• Max: {stats['max_ms']:.1f}ms\n\n"
+    )
+    for bucket, count in stats['histogram'].items():
+        response += f"{bucket}: {count}\n"
+    
+    if stats['stalls']:
+        # Show the innermost frames of the most recent stall
+        stall = stats['stalls'][-1]
+        stack_tail = stall['stack'][-2000:]
+        response += f"\nAn toshe loop na {stall['blocked_ms']}ms a {stall['at']}:\n{stack_tail}"
+    
+    await message.answer(f"<pre>{html.escape(response)}</pre>", parse_mode="HTML")
+
+FIND_PAGE_SIZE = 10
+FIND_DETAILS_LENGTH = 200
+
+def _shorten(text: str, limit: int) -> str:
+    """Trim text to ``limit`` characters, marking the cut with an ellipsis"""
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+async def find_command(message: types.Message, database: Database, config: Config):
+    """Handle /find command (Admin only)"""
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    # /find <kalma> [#cursor], the cursor comes from the previous page's link
+    parts = message.text.split()[1:]
+    before = None
+    if parts and re.fullmatch(r'#-?\d+', parts[-1]):
+        before = int(parts.pop()[1:])
+    query = " ".join(parts)
+    if not query:
+        await message.answer("Amfani: /find [Lamba/Username/Bayanan Banki]")
+        return
+    
+    results, next_before = await database.search(query, before, FIND_PAGE_SIZE)
+    if not results:
+        await message.answer(
+            f"Ba a sami wani sakamako ba. Kowace kalma ta kasance a kalla haruffa {SEARCH_MIN_TERM_LENGTH}."
+        )
+        return
+    
+    response = f"🔎 Sakamakon '{query}':\n\n"
+    for result in results:
+        if result['kind'] == 'account':
+            response += (
+                f"📞 {result['phone']} — User {result['user_id']} (@{result['username'] or '-'}) "
+                f"— {result['status']}/{result['payment_status']}\n"
+            )
+        else:
+            response += (
+                f"💳 Withdrawal #{result['id']} — User {result['user_id']} (@{result['username'] or '-'}) "
+                f"— {result['status']}\n   {_shorten(result['bank_details'], FIND_DETAILS_LENGTH)}\n"
+            )
+    if next_before is not None:
+        response += f"\nShafi na gaba: /find {query} #{next_before}"
+    
+    await _answer_in_chunks(message, response)
+
+async def memory_command(message: types.Message, database: Database, config: Config):
+    """Handle /memory command (Admin only)"""
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    from low_memory import get_memory_usage, format_bytes
+    usage = get_memory_usage()
+    
+    await message.answer(
+        "🧠 Memory:\n"
+        f"• Yanayi: {'low-memory' if config.LOW_MEMORY else 'na yau da kullum'}\n"
+        f"• RSS yanzu: {format_bytes(usage['current_rss'])}\n"
+        f"• Peak RSS: {format_bytes(usage['peak_rss'])}"
+    )
+
+async def queue_stats_command(message: types.Message, database: Database, config: Config,
+                              update_scheduler: Optional["UpdateScheduler"] = None):
+    """Handle /queue_stats command (Admin only)"""
+    if not config.is_admin(message.from_user.id):
+        return
+    
+    if update_scheduler is None:
+        await message.answer("Ba a kunna update scheduler ba.")
+        return
+    
+    stats = update_scheduler.get_stats()
+    response = (
+        "📥 Update Queues:\n"
+        f"• Users masu jira: {stats['active_users']} ({stats['queued']} updates)\n"
+        f"• An yar (user queue): {stats['dropped_user_queue']}\n"
+    )
+    for name, lane in stats['lanes'].items():
+        response += (
+            f"\n{name}: pending {lane['pending']}, an gama {lane['processed']}, an yar {lane['dropped']}\n"
+            f"  jira p50 {lane['wait_p50_ms']:.1f}ms, p95 {lane['wait_p95_ms']:.1f}ms, "
+            f"max {lane['wait_max_ms']:.1f}ms\n"
+        )
+    
+    await message.answer(response)
+
+async def register_handlers(dp, database: Database, config: Config,
+                            throttling: Optional["ThrottlingMiddleware"] = None,
+                            loop_monitor: Optional["LoopMonitor"] = None,
+                            update_scheduler: Optional["UpdateScheduler"] = None):
     """Register all admin handlers"""
     # Helper function to wrap handlers with dependencies
     def wrap_handler(handler):
+        params = inspect.signature(handler).parameters
         async def wrapped_handler(event, **kwargs):
             kwargs["database"] = database
             kwargs["config"] = config
-            return await handler(event, **kwargs)
+            kwargs["throttling"] = throttling
+            kwargs["loop_monitor"] = loop_monitor
+            kwargs["update_scheduler"] = update_scheduler
+            # aiogram also passes bot, event_from_user, etc.; keep only what the handler takes
+            return await handler(event, **{key: value for key, value in kwargs.items() if key in params})
         return wrapped_handler
     
     # Register admin handlers
     dp.message.register(wrap_handler(user_accounts_command), Command("user_accounts"))
     dp.message.register(wrap_handler(mark_paid_command), Command("mark_paid"))
+    dp.message.register(wrap_handler(mark_paid_batch_command), Command("mark_paid_batch"))
     dp.message.register(wrap_handler(completed_today_payment_command), Command("completed_today_payment"))
     dp.message.register(wrap_handler(stats_command), Command("stats"))
+    dp.message.register(wrap_handler(throttle_stats_command), Command("throttle_stats"))
+    dp.message.register(wrap_handler(profile_command), Command("profile"))
+    dp.message.register(wrap_handler(loop_stats_command), Command("loop_stats"))
+    dp.message.register(wrap_handler(memory_command), Command("memory"))
+    dp.message.register(wrap_handler(find_command), Command("find"))
+    dp.message.register(wrap_handler(queue_stats_command), Command("queue_stats"))
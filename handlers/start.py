@@ -3,6 +3,7 @@ Start command and account submission handlers
 """
 
 import re
+import inspect
 import logging
 from typing import Dict, Any
 
@@ -28,6 +29,12 @@ async def start_command(message: types.Message, state: FSMContext, database: Dat
     """Handle /start command"""
     user_id = message.from_user.id
     
+    # Restarting abandons any submission in progress, so free its phone number
+    data = await state.get_data()
+    if data.get('phone_number'):
+        await database.release_phone_claim(user_id, data['phone_number'])
+    await state.clear()
+    
     # Check if accounts are open
     accounts_open = await database.get_accounts_open_status()
     if not accounts_open:
@@ -37,9 +44,6 @@ async def start_command(message: types.Message, state: FSMContext, database: Dat
         )
         return
     
-    # Clear any existing state
-    await state.clear()
-    
     # Welcome message in Hausa
     welcome_text = (
         "Barka da zuwa cibiyar karbar Telegram accounts! Don farawa, turo lambar wayar "
@@ -64,8 +68,13 @@ async def process_phone_number(message: types.Message, state: FSMContext, databa
     
     phone_number = format_phone_number(phone_text)
     
-    # Check if phone number already exists
-    if await database.check_phone_exists(phone_number):
+    # Claim the phone number atomically (fails if it is already registered)
+    user_id = message.from_user.id
+    username = message.from_user.username or ""
+    claim = await database.claim_phone_number(
+        user_id, username, phone_number, config.PHONE_CLAIM_TIMEOUT_MINUTES
+    )
+    if not claim["claimed"]:
         await message.answer(
             f"⚠️ Kuskure! An riga an yi rajistar wannan lambar!\n"
             f"{phone_number}\n"
@@ -92,6 +101,7 @@ async def process_phone_number(message: types.Message, state: FSMContext, databa
             await message.answer(
                 "Kuskure yayin neman OTP. Don Allah ka tabbatar lambar wayar daidai ce kuma ka sake gwadawa."
             )
+            await database.release_phone_claim(user_id, phone_number)
             await state.clear()
             
     except Exception as e:
@@ -99,6 +109,7 @@ async def process_phone_number(message: types.Message, state: FSMContext, databa
         await message.answer(
             "Kuskure yayin neman OTP. Don Allah ka sake gwadawa."
         )
+        await database.release_phone_claim(user_id, phone_number)
         await state.clear()
 
 async def process_otp(message: types.Message, state: FSMContext, database: Database, 
@@ -124,6 +135,9 @@ async def process_otp(message: types.Message, state: FSMContext, database: Datab
         await state.clear()
         return
     
+    user_id = message.from_user.id
+    account_saved = False
+    
     try:
         # Verify OTP and login
         login_result = await telethon_manager.verify_otp_and_login(phone_number, otp_text)
@@ -137,32 +151,30 @@ async def process_otp(message: types.Message, state: FSMContext, database: Datab
                 await state.clear()
                 return
             
-            # Add account to database
-            user_id = message.from_user.id
-            username = message.from_user.username or ""
+            # The pending account row was claimed when the phone number was submitted
+            # Set 2FA password
+            await telethon_manager.set_2fa_password(phone_number, config.ACCOUNT_PASSWORD)
             
-            if await database.add_user_account(user_id, username, phone_number):
-                # Set 2FA password
-                await telethon_manager.set_2fa_password(phone_number, config.ACCOUNT_PASSWORD)
-                
-                # Update account status
-                await database.update_account_status(phone_number, 'successful')
-                
-                # Success message
-                await message.answer(
-                    "An shiga account din ku cikin nasara ku cire shi daga na'urar ku. "
-                    "Za a biya ku bisa ga adadin account din da kuka kawo. "
-                    "Ana biyan kuɗi daga karfe 8:00 na dare (WAT) zuwa gaba. "
-                    "Don Allah ka shirya tura bukatar biya."
-                )
-                
-                logger.info(f"Account {phone_number} successfully processed for user {user_id}")
-                
-            else:
+            # Credit the account only if the claim is still this user's
+            if not await database.complete_phone_claim(user_id, phone_number):
+                logger.warning(f"Claim on {phone_number} expired before user {user_id} finished login")
                 await message.answer(
-                    "Kuskure yayin ajiye account. Don Allah ka sake gwadawa."
+                    "⚠️ Lokacin da aka ba ka don kammala wannan lambar ya kare. "
+                    "Don Allah ka sake farawa da /start."
                 )
-                
+                return
+            account_saved = True
+            
+            # Success message
+            await message.answer(
+                "An shiga account din ku cikin nasara ku cire shi daga na'urar ku. "
+                "Za a biya ku bisa ga adadin account din da kuka kawo. "
+                "Ana biyan kuɗi daga karfe 8:00 na dare (WAT) zuwa gaba. "
+                "Don Allah ka shirya tura bukatar biya."
+            )
+            
+            logger.info(f"Account {phone_number} successfully processed for user {user_id}")
+            
         else:
             await message.answer(
                 f"Kuskure yayin shiga account: {login_result.get('error', 'Ba a san dalilin kuskure ba')}"
@@ -175,37 +187,50 @@ async def process_otp(message: types.Message, state: FSMContext, database: Datab
         )
         
     finally:
+        # Free the number again if the submission did not complete
+        if not account_saved:
+            await database.release_phone_claim(user_id, phone_number)
         await state.clear()
 
-async def cancel_command(message: types.Message, state: FSMContext):
+async def cancel_command(message: types.Message, state: FSMContext, database: Database):
     """Handle /cancel command"""
+    data = await state.get_data()
+    if data.get('phone_number'):
+        await database.release_phone_claim(message.from_user.id, data['phone_number'])
     await state.clear()
     await message.answer("An soke aikin cikin nasara.")
 
+MY_ACCOUNTS_LIMIT = 50
+
 async def my_accounts_command(message: types.Message, database: Database):
     """Handle /myaccounts command"""
     user_id = message.from_user.id
-    accounts = await database.get_user_accounts(user_id)
     
-    if not accounts:
+    # Fetch one row past the cap to know whether older accounts were left out
+    lines = []
+    async for account in database.iter_user_accounts(user_id, MY_ACCOUNTS_LIMIT + 1):
+        lines.append(f"📞 `{account['phone']}` — `{account['status']}`\n")
+    
+    if not lines:
         await message.answer("Ba ka da wata lamba da ka tura tukuna.")
         return
     
-    response = "📋 Lambar da ka tura:\n\n"
-    for account in accounts:
-        response += f"📞 `{account['phone']}` — `{account['status']}`\n"
-    
+    response = "📋 Lambar da ka tura:\n\n" + "".join(lines[:MY_ACCOUNTS_LIMIT])
+    if len(lines) > MY_ACCOUNTS_LIMIT:
+        response += f"\nAna nuna sabbin lambobi {MY_ACCOUNTS_LIMIT} kawai."
     await message.answer(response, parse_mode="Markdown")
 
 async def register_handlers(dp, database: Database, telethon_manager: TelethonManager, config: Config):
     """Register all handlers"""
     # Helper function to wrap handlers with dependencies
     def wrap_handler(handler):
+        params = inspect.signature(handler).parameters
         async def wrapped_handler(event, **kwargs):
             kwargs["database"] = database
             kwargs["telethon_manager"] = telethon_manager
             kwargs["config"] = config
-            return await handler(event, **kwargs)
+            # aiogram also passes bot, event_from_user, etc.; keep only what the handler takes
+            return await handler(event, **{key: value for key, value in kwargs.items() if key in params})
         return wrapped_handler
     
     # Register handlers with dependency injection
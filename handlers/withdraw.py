@@ -2,6 +2,7 @@
 Withdrawal command handlers
 """
 
+import inspect
 import logging
 from typing import Dict, Any
 
@@ -85,8 +86,7 @@ async def process_bank_details(message: types.Message, state: FSMContext, databa
     
     # Send notification to admin
     try:
-        from aiogram import Bot
-        bot = Bot.get_current()
+        bot = message.bot
         
         admin_message = (
             "BUKATAR BIYA!\n\n"
@@ -104,16 +104,56 @@ async def process_bank_details(message: types.Message, state: FSMContext, databa
     
     await state.clear()
 
+WITHDRAWALS_PAGE_SIZE = 5
+
+async def withdrawals_command(message: types.Message, database: Database):
+    """Handle /withdrawals command - paginated withdrawal history"""
+    user_id = message.from_user.id
+    
+    # /withdrawals [id na bukatar karshe a shafin baya]
+    parts = message.text.split()
+    before_id = None
+    if len(parts) > 1:
+        try:
+            before_id = int(parts[1])
+        except ValueError:
+            await message.answer("Amfani: /withdrawals [ID]")
+            return
+    
+    # Fetch one extra row to know whether another page exists
+    requests = await database.get_user_withdrawal_requests(user_id, WITHDRAWALS_PAGE_SIZE + 1, before_id)
+    if not requests:
+        await message.answer("Ba ka da wata bukatar cire kuɗi tukuna.")
+        return
+    
+    has_more = len(requests) > WITHDRAWALS_PAGE_SIZE
+    requests = requests[:WITHDRAWALS_PAGE_SIZE]
+    
+    response = "💳 Bukatun cire kuɗi:\n\n"
+    for request in requests:
+        response += (
+            f"#{request['id']} — accounts {request['account_count']} — {request['status']}\n"
+            f"   An nema: {request['created_at']}\n"
+            f"   An biya: {request['processed_at'] or 'ana jira'}\n"
+        )
+    if has_more:
+        response += f"\nShafi na gaba: /withdrawals {requests[-1]['id']}"
+    
+    await message.answer(response)
+
 async def register_handlers(dp, database: Database, config: Config):
     """Register all withdrawal handlers"""
     # Helper function to wrap handlers with dependencies
     def wrap_handler(handler):
+        params = inspect.signature(handler).parameters
         async def wrapped_handler(event, **kwargs):
             kwargs["database"] = database
             kwargs["config"] = config
-            return await handler(event, **kwargs)
+            # aiogram also passes bot, event_from_user, etc.; keep only what the handler takes
+            return await handler(event, **{key: value for key, value in kwargs.items() if key in params})
         return wrapped_handler
     
     # Register withdrawal handlers
     dp.message.register(wrap_handler(withdraw_command), Command("withdraw"))
+    dp.message.register(wrap_handler(withdrawals_command), Command("withdrawals"))
     dp.message.register(wrap_handler(process_bank_details), WithdrawStates.waiting_for_bank_details)
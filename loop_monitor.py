@@ -0,0 +1,125 @@
+"""
+Event loop health monitor that measures scheduling lag and catches blocking calls
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the lag histogram buckets; the last bucket is open-ended
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+class LoopMonitor:
+    """Tracks how late the event loop wakes up and who is blocking it.
+
+    A coroutine on the loop sleeps for a fixed interval and records how late
+    it resumes. A watchdog thread watches the same heartbeat; when the loop
+    has not ticked for longer than the threshold, it captures the stack of
+    the loop thread, which is the code that is blocking it right now.
+    """
+
+    def __init__(self, config: Config):
+        self.interval = config.LOOP_MONITOR_INTERVAL
+        self.threshold = config.LOOP_LAG_THRESHOLD_MS / 1000
+        self.samples = deque(maxlen=config.LOOP_MONITOR_SAMPLES)
+        self.stalls = deque(maxlen=10)
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def start(self):
+        """Start measuring lag on the running loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Loop monitor started")
+
+    async def stop(self):
+        """Stop the measuring task and the watchdog thread"""
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Loop monitor stopped")
+
+    async def _measure(self):
+        """Sleep for the interval and record how late the loop wakes us"""
+        while True:
+            expected = time.monotonic() + self.interval
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                logger.warning(f"Event loop lag {lag * 1000:.0f}ms")
+
+    def _watch(self):
+        """Watchdog thread: capture the loop's stack when it stops ticking"""
+        captured_for = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for < self.threshold or captured_for == heartbeat:
+                continue
+            # Capture once per stall; the heartbeat changes when the loop recovers
+            captured_for = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.stalls.append({
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "blocked_ms": int(blocked_for * 1000),
+                "stack": stack,
+            })
+            logger.warning(f"Event loop blocked for {blocked_for * 1000:.0f}ms at:\n{stack}")
+
+    def histogram(self) -> Dict[str, int]:
+        """Count recent lag samples per bucket"""
+        counts = {f"<{bound}ms": 0 for bound in LAG_BUCKETS_MS}
+        counts[f">={LAG_BUCKETS_MS[-1]}ms"] = 0
+        for lag in self.samples:
+            lag_ms = lag * 1000
+            for bound in LAG_BUCKETS_MS:
+                if lag_ms < bound:
+                    counts[f"<{bound}ms"] += 1
+                    break
+            else:
+                counts[f">={LAG_BUCKETS_MS[-1]}ms"] += 1
+        return counts
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of loop health for admins and metrics"""
+        ordered: List[float] = sorted(self.samples)
+        def percentile(fraction: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+        return {
+            "samples": len(ordered),
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": self.max_lag * 1000,
+            "histogram": self.histogram(),
+            "stalls": list(self.stalls),
+        }
@@ -0,0 +1,108 @@
+"""
+Memory-lean runtime helpers for constrained devices (Termux)
+"""
+
+import os
+import sys
+import logging
+from copy import copy
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage, MemoryStorageRecord
+
+try:
+    from aiogram.exceptions import DataNotDictLikeError
+except ImportError:  # older aiogram, such as the 3.4.1 Termux pin, has no dedicated error
+    DataNotDictLikeError = TypeError
+
+logger = logging.getLogger(__name__)
+
+class _BoundedRecords(OrderedDict):
+    """Least recently used FSM records, creating missing ones like a defaultdict"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def __missing__(self, key: StorageKey) -> MemoryStorageRecord:
+        record = self[key] = MemoryStorageRecord()
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+        return record
+
+class BoundedMemoryStorage(MemoryStorage):
+    """MemoryStorage that forgets idle conversations instead of growing forever.
+
+    Cleared conversations are dropped immediately and at most ``max_size``
+    records are kept, evicting the least recently used one first.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.storage = _BoundedRecords(max_size)
+
+    def _touch(self, key: StorageKey) -> MemoryStorageRecord:
+        record = self.storage[key]
+        self.storage.move_to_end(key)
+        return record
+
+    def _drop_if_empty(self, key: StorageKey):
+        record = self.storage.get(key)
+        if record is not None and record.state is None and not record.data:
+            del self.storage[key]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._touch(key).state = state.state if isinstance(state, State) else state
+        self._drop_if_empty(key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self.storage.get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        self._touch(key).data = data.copy()
+        self._drop_if_empty(key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self.storage.get(key)
+        return record.data.copy() if record else {}
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str,
+                        default: Optional[Any] = None) -> Optional[Any]:
+        # Reading must not create (and possibly evict for) an empty record
+        record = self.storage.get(storage_key)
+        return copy(record.data.get(dict_key, default)) if record else default
+
+def get_memory_usage() -> Dict[str, Optional[int]]:
+    """Return current and peak resident set size in bytes (None if unknown)"""
+    current = None
+    peak = None
+    try:
+        # /proc/self/statm reports sizes in pages: size resident shared ...
+        with open('/proc/self/statm') as statm:
+            current = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux/Android but bytes on macOS
+        peak = max_rss if sys.platform == 'darwin' else max_rss * 1024
+    except (ImportError, OSError):
+        pass
+    return {"current_rss": current, "peak_rss": peak}
+
+def format_bytes(size: Optional[int]) -> str:
+    """Human readable byte count"""
+    if size is None:
+        return "unknown"
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
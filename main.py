@@ -7,9 +7,11 @@ A bot for automated account trading with OTP forwarding and payment management
 import asyncio
 import logging
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
@@ -35,13 +37,42 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TelegramTradingBot:
-    def __init__(self):
+    def __init__(self, session: Optional[BaseSession] = None, database: Optional[Database] = None,
+                 telethon_manager: Optional[TelethonManager] = None):
+        # session/database/telethon_manager can be swapped for fakes by replay.py
         self.config = Config()
-        self.bot = Bot(token=self.config.BOT_TOKEN)
-        self.dp = Dispatcher(storage=MemoryStorage())
-        self.database = Database(self.config.DATABASE_NAME)
-        self.telethon_manager = TelethonManager(self.config)
-        self.scheduler = BotScheduler(self.config)
+        self.bot = Bot(token=self.config.BOT_TOKEN, session=session)
+        self.dp = Dispatcher(storage=self._create_storage())
+        self.database = database or Database(self.config.DATABASE_NAME, low_memory=self.config.LOW_MEMORY)
+        self.telethon_manager = telethon_manager or TelethonManager(self.config)
+        self.scheduler = BotScheduler(self.config, self.database)
+        self.throttling = None
+        self.update_scheduler = None
+        self.loop_monitor = None
+        self.recorder = None
+        self._create_middlewares()
+        
+    def _create_storage(self):
+        """FSM storage: bounded in low-memory mode so idle conversations are dropped"""
+        if self.config.LOW_MEMORY:
+            from low_memory import BoundedMemoryStorage
+            return BoundedMemoryStorage(self.config.FSM_MAX_USERS)
+        return MemoryStorage()
+        
+    def _create_middlewares(self):
+        """Build only the optional components that are enabled, importing them on demand"""
+        if self.config.THROTTLE_ENABLED:
+            from throttling import ThrottlingMiddleware
+            self.throttling = ThrottlingMiddleware(self.config)
+        if self.config.UPDATE_SCHEDULER_ENABLED:
+            from update_scheduler import UpdateScheduler
+            self.update_scheduler = UpdateScheduler(self.config)
+        if self.config.LOOP_MONITOR_ENABLED:
+            from loop_monitor import LoopMonitor
+            self.loop_monitor = LoopMonitor(self.config)
+        if self.config.RECORD_UPDATES_PATH:
+            from recorder import UpdateRecorderMiddleware
+            self.recorder = UpdateRecorderMiddleware(self.config)
         
     async def setup_bot_commands(self):
         """Setup bot commands menu"""
@@ -49,21 +80,39 @@ class TelegramTradingBot:
             BotCommand(command="start", description="Fara aiki da bot"),
             BotCommand(command="myaccounts", description="Duba lambobin da ka tura"),
             BotCommand(command="withdraw", description="Nemi cire kuɗi"),
+            BotCommand(command="withdrawals", description="Duba tarihin cire kuɗi"),
             BotCommand(command="cancel", description="Soke aiki"),
         ]
         await self.bot.set_my_commands(commands)
         
     async def setup_handlers(self):
         """Setup message handlers"""
+        # Record updates (when enabled) before throttling so the full traffic is captured
+        if self.recorder:
+            self.dp.update.outer_middleware(self.recorder)
+        
+        # Throttle per-user floods before they reach any handler
+        if self.throttling:
+            self.dp.update.outer_middleware(self.throttling)
+        
+        # Run each user's updates in order, different users in parallel
+        if self.update_scheduler:
+            self.dp.update.outer_middleware(self.update_scheduler)
+        
         # Import and register handlers
         await start.register_handlers(self.dp, self.database, self.telethon_manager, self.config)
-        await admin.register_handlers(self.dp, self.database, self.config)
+        await admin.register_handlers(self.dp, self.database, self.config, self.throttling,
+                                     self.loop_monitor, self.update_scheduler)
         await withdraw.register_handlers(self.dp, self.database, self.config)
         
     async def startup(self):
         """Bot startup sequence"""
         logger.info("Bot yana farawa...")
         
+        # Watch the event loop for lag and blocking calls
+        if self.loop_monitor:
+            await self.loop_monitor.start()
+        
         # Initialize database
         await self.database.init_db()
         
@@ -79,6 +128,14 @@ class TelegramTradingBot:
         # Start scheduler
         await self.scheduler.start()
         
+        if self.config.LOW_MEMORY:
+            from low_memory import get_memory_usage, format_bytes
+            usage = get_memory_usage()
+            logger.info(
+                f"Low-memory mode: RSS {format_bytes(usage['current_rss'])}, "
+                f"peak {format_bytes(usage['peak_rss'])}"
+            )
+        
         logger.info("Bot ya fara aiki cikin nasara!")
         
     async def shutdown(self):
@@ -94,6 +151,14 @@ class TelegramTradingBot:
         # Close database
         await self.database.close()
         
+        # Stop loop monitor
+        if self.loop_monitor:
+            await self.loop_monitor.stop()
+        
+        # Finish update recording
+        if self.recorder:
+            self.recorder.close()
+        
         logger.info("Bot ya rufe cikin nasara!")
 
 async def main():
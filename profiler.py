@@ -0,0 +1,77 @@
+"""
+On-demand runtime profiler for the running bot
+"""
+
+import io
+import os
+import time
+import pstats
+import asyncio
+import cProfile
+import logging
+import tempfile
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hard cap so a forgotten profile cannot slow the bot for long
+MAX_PROFILE_SECONDS = 300
+TOP_ENTRIES = 25
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+class RuntimeProfiler:
+    """Profiles the event loop thread for a fixed window.
+
+    cProfile is only enabled for the duration of a run, so there is no
+    overhead while profiling is off. Everything executing on the loop
+    thread is captured: handlers, Database calls and scheduler jobs.
+    """
+
+    def __init__(self):
+        self.running = False
+
+    async def run(self, seconds: int) -> Tuple[str, bytes]:
+        """Profile for ``seconds`` and return a hotspot report and raw pstats data"""
+        if self.running:
+            raise ProfilerBusyError("A profile is already running")
+        seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+
+        self.running = True
+        profile = cProfile.Profile()
+        started = time.monotonic()
+        try:
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+        finally:
+            self.running = False
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Runtime profile captured over {elapsed:.1f}s")
+        return self._format_report(profile, elapsed), self._dump(profile)
+
+    @staticmethod
+    def _format_report(profile: cProfile.Profile, elapsed: float) -> str:
+        """Render the top cumulative hotspots as text"""
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+        return f"Profile over {elapsed:.1f}s\n{stream.getvalue()}"
+
+    @staticmethod
+    def _dump(profile: cProfile.Profile) -> bytes:
+        """Serialize the profile in pstats format for offline analysis"""
+        fd, path = tempfile.mkstemp(suffix=".prof")
+        os.close(fd)
+        try:
+            profile.dump_stats(path)
+            with open(path, "rb") as dump_file:
+                return dump_file.read()
+        finally:
+            os.remove(path)
+
+profiler = RuntimeProfiler()
@@ -0,0 +1,154 @@
+"""
+Opt-in recorder that writes anonymized incoming updates to compressed JSONL
+"""
+
+import os
+import re
+import json
+import gzip
+import hmac
+import time
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# The admin always maps to this ID so replays can exercise admin commands
+ADMIN_PSEUDONYM = 1
+# Only these parts of an update are recorded; everything else (forwards,
+# replies, entities, media, members, other update types) is dropped
+MESSAGE_KEYS = ("message", "edited_message")
+TEXT_KEYS = ("text", "caption")
+# Seconds between gzip sync flushes, bounding what an unclean exit can lose
+FLUSH_INTERVAL = 5.0
+
+class UpdateAnonymizer:
+    """Replaces identities and message contents with stable, shape-preserving pseudonyms"""
+
+    def __init__(self, salt: str, admin_id: int):
+        self.key = salt.encode()
+        self.admin_id = admin_id
+
+    def _digest(self, value: str) -> bytes:
+        return hmac.new(self.key, value.encode(), hashlib.sha256).digest()
+
+    def user_id(self, user_id: int) -> int:
+        """Map a real ID to a stable pseudonymous ID"""
+        if user_id == self.admin_id:
+            return ADMIN_PSEUDONYM
+        pseudonym = int.from_bytes(self._digest(str(user_id))[:6], "big") % 10**12 + 10**9
+        # Keep group/channel IDs negative so chat types still line up
+        return -pseudonym if user_id < 0 else pseudonym
+
+    def text(self, text: str) -> str:
+        """Keep commands and the text's shape but replace its characters.
+
+        Digits stay digits and letters stay letters, so phone numbers, OTPs and
+        bank details still pass the handlers' format checks on replay.
+        """
+        command = ""
+        if text.startswith("/"):
+            command, _, text = text.partition(" ")
+            if not text:
+                return command
+            command += " "
+
+        digest = self._digest(text)
+        counter = 0
+        def replace(match: "re.Match") -> str:
+            nonlocal counter
+            byte = digest[counter % len(digest)]
+            counter += 1
+            char = match.group(0)
+            if char.isdigit():
+                return str(byte % 10)
+            letter = chr(ord("a") + byte % 26)
+            return letter.upper() if char.isupper() else letter
+
+        return command + re.sub(r"[^\W_]", replace, text)
+
+    def _user(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        pseudonym = self.user_id(user["id"])
+        result = {"id": pseudonym, "is_bot": user.get("is_bot", False), "first_name": f"user{pseudonym}"}
+        if "username" in user:
+            result["username"] = f"user{pseudonym}"
+        return result
+
+    def _chat(self, chat: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": self.user_id(chat["id"]), "type": chat["type"]}
+
+    def _message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            "message_id": message["message_id"],
+            "date": message["date"],
+            "chat": self._chat(message["chat"]),
+        }
+        if "from" in message:
+            result["from"] = self._user(message["from"])
+        for key in TEXT_KEYS:
+            if isinstance(message.get(key), str):
+                result[key] = self.text(message[key])
+        return result
+
+    def anonymize(self, update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Keep only the allow-listed fields of a serialized update, anonymized.
+
+        Returns None for updates without a message, which replays cannot use.
+        """
+        for key in MESSAGE_KEYS:
+            if key in update:
+                return {"update_id": update["update_id"], key: self._message(update[key])}
+        return None
+
+def run_path(path: str, stamp: str) -> str:
+    """Insert a run timestamp before the extension: updates.jsonl.gz -> updates_<stamp>.jsonl.gz"""
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition(".")
+    return os.path.join(directory, f"{stem}_{stamp}{dot}{extension}")
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+    """Outer update middleware that writes every message update to a per-run gzip JSONL file"""
+
+    def __init__(self, config: Config):
+        # One file per run: offsets and pseudonyms are only consistent within a run
+        self.path = run_path(config.RECORD_UPDATES_PATH, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.anonymizer = UpdateAnonymizer(config.RECORD_SALT, config.ADMIN_ID)
+        self.started = time.monotonic()
+        self.flushed = self.started
+        self.recorded = 0
+        self._file = gzip.open(self.path, "wt", encoding="utf-8")
+        logger.info(f"Recording anonymized updates to {self.path}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            try:
+                update = self.anonymizer.anonymize(event.model_dump(mode="json", exclude_none=True, by_alias=True))
+                if update is not None:
+                    now = time.monotonic()
+                    record = {"offset": round(now - self.started, 3), "update": update}
+                    self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self.recorded += 1
+                    if now - self.flushed >= FLUSH_INTERVAL:
+                        # Sync-flush so a crash leaves a readable prefix, not a corrupt stream
+                        self._file.flush()
+                        self.flushed = now
+            except Exception as e:
+                logger.error(f"Error recording update: {e}")
+        return await handler(event, data)
+
+    def close(self):
+        """Flush and close the recording"""
+        self._file.close()
+        logger.info(f"Recorded {self.recorded} updates to {self.path}")
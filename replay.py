@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Replay recorded update traffic through the bot's dispatcher
+
+Feeds a gzip JSONL file written by recorder.UpdateRecorderMiddleware through a
+Dispatcher set up exactly like TelegramTradingBot.setup_handlers, against a
+fake Bot API session and an in-memory database, then reports latency, errors
+and how many updates were throttled or dropped. Throttle rates are multiplied
+by --speed so faster playback is not throttled more than the live traffic was.
+Run it on two checkouts and pass --compare to see the deltas:
+
+    python replay.py updates.jsonl.gz --speed 10 --output new.json --compare old.json
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional
+
+from recorder import ADMIN_PSEUDONYM
+
+# Replays must never touch the real bot, admin or recording settings
+os.environ['BOT_TOKEN'] = '123456:replay'
+os.environ['ADMIN_ID'] = str(ADMIN_PSEUDONYM)
+os.environ['CHANNEL_ID'] = '0'
+os.environ['RECORD_UPDATES_PATH'] = ''
+os.environ.setdefault('API_ID', '1')
+os.environ.setdefault('API_HASH', 'replay')
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, Update
+
+from database import Database
+from main import TelegramTradingBot
+
+class FakeBotSession(BaseSession):
+    """Bot API session that answers every call locally after a fixed delay"""
+
+    def __init__(self, api_latency: float = 0.0):
+        super().__init__()
+        self.api_latency = api_latency
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+        returning = method.__returning__
+        if returning is Message:
+            self._message_id += 1
+            return Message(
+                message_id=self._message_id,
+                date=datetime.now(),
+                chat=Chat(id=getattr(method, 'chat_id', 0) or 0, type='private'),
+                text=getattr(method, 'text', None),
+            )
+        if returning is bool:
+            return True
+        return returning.model_construct()
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+class FakeTelethonManager:
+    """Stands in for TelethonManager so every login attempt succeeds offline"""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def request_otp(self, phone_number: str) -> bool:
+        return True
+
+    async def verify_otp_and_login(self, phone_number: str, otp: str) -> Dict[str, Any]:
+        return {"success": True}
+
+    async def set_2fa_password(self, phone_number: str, password: str) -> bool:
+        return True
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield recorded updates in order, stopping cleanly at a truncated tail"""
+    with gzip.open(path, 'rt', encoding='utf-8') as records:
+        try:
+            for line in records:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, json.JSONDecodeError) as e:
+            # The bot exited without closing the recording; keep what was flushed
+            print(f"warning: {path} is truncated ({e}), replaying the records before it", file=sys.stderr)
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def scale_throttling(throttling, speed: float):
+    """Speed up token refill so compressed playback throttles like the recorded pacing"""
+    throttling.user_rate *= speed
+    throttling.global_bucket.rate *= speed
+    throttling.command_limits = {
+        command: (rate * speed, burst) for command, (rate, burst) in throttling.command_limits.items()
+    }
+
+async def replay(path: str, speed: float, api_latency: float) -> Dict[str, Any]:
+    """Replay a recording and return a latency and error report"""
+    session = FakeBotSession(api_latency)
+    app = TelegramTradingBot(
+        session=session,
+        database=Database(':memory:'),
+        telethon_manager=FakeTelethonManager(),
+    )
+    await app.database.init_db()
+    await app.setup_handlers()
+    if app.throttling:
+        scale_throttling(app.throttling, speed)
+
+    latencies: List[float] = []
+    errors: Counter = Counter()
+
+    async def feed(update: Update):
+        started = time.perf_counter()
+        try:
+            await app.dp.feed_update(app.bot, update)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    tasks = []
+    replay_started = time.monotonic()
+    for record in read_records(path):
+        # Keep the recorded pacing, compressed by the speed factor
+        delay = record['offset'] / speed - (time.monotonic() - replay_started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        update = Update.model_validate(record['update'], context={"bot": app.bot})
+        tasks.append(asyncio.create_task(feed(update)))
+    await asyncio.gather(*tasks)
+    duration = time.monotonic() - replay_started
+
+    await app.database.close()
+
+    # Throttled and dropped updates return quickly, so they would otherwise flatter latency
+    throttled = 0
+    if app.throttling:
+        throttled = app.throttling.counters["throttled_user"] + app.throttling.counters["throttled_global"]
+    dropped = 0
+    if app.update_scheduler:
+        stats = app.update_scheduler.get_stats()
+        dropped = stats["dropped_user_queue"] + sum(lane["dropped"] for lane in stats["lanes"].values())
+
+    total = len(latencies)
+    return {
+        "updates": total,
+        "duration_s": round(duration, 3),
+        "throughput": round(total / duration, 1) if duration else 0.0,
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "errors_by_type": dict(errors),
+        "throttled": throttled,
+        "dropped": dropped,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+        "api_calls": dict(session.calls),
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    """Format the difference between two replay reports"""
+    lines = [f"{'metric':<12}{'baseline':>12}{'current':>12}{'delta':>12}"]
+    for metric in ("updates", "throughput", "errors", "error_rate", "throttled", "dropped",
+                   "p50_ms", "p95_ms", "p99_ms", "max_ms"):
+        old = baseline.get(metric, 0)
+        new = report.get(metric, 0)
+        delta = new - old
+        change = f" ({delta / old:+.1%})" if old else ""
+        lines.append(f"{metric:<12}{old:>12}{new:>12}{delta:>+12.4g}{change}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded bot traffic")
+    parser.add_argument("recording", help="gzip JSONL file written by the update recorder")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed, 1 to 100 (default 1)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API latency in ms")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report from another code version")
+    args = parser.parse_args()
+
+    if not 1 <= args.speed <= 100:
+        parser.error("--speed must be between 1 and 100")
+
+    report = asyncio.run(replay(args.recording, args.speed, args.api_latency / 1000))
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print()
+            print(compare(report, json.load(baseline_file)))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -78,6 +78,9 @@ async def run_bot():
         print("⏰ Press Ctrl+C to stop the bot")
         print("-" * 40)
         
+        # Phones have little RAM, so run lean unless the user opted out in .env
+        os.environ.setdefault('LOW_MEMORY', 'true')
+        
         # Import and run main bot
         from main import main as bot_main
         await bot_main()
@@ -2,12 +2,20 @@
 Scheduler for time-based operations
 """
 
+import os
+import glob
+import gzip
+import shutil
+import asyncio
 import logging
+import time as timer
 from datetime import datetime, time
+from typing import Dict, Optional
 import pytz
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from config import Config
 from database import Database
@@ -15,10 +23,12 @@ from database import Database
 logger = logging.getLogger(__name__)
 
 class BotScheduler:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, database: Database):
         self.config = config
         self.scheduler = AsyncIOScheduler()
-        self.database = Database(config.DATABASE_NAME)
+        # Shared with the bot so in-memory mode schedules against the same data
+        self.database = database
+        self.last_backup: Optional[Dict] = None
         
     async def start(self):
         """Start the scheduler"""
@@ -44,6 +54,15 @@ class BotScheduler:
             id='close_accounts'
         )
         
+        # Online database backups
+        self.scheduler.add_job(
+            self.backup_database,
+            IntervalTrigger(hours=self.config.BACKUP_INTERVAL_HOURS),
+            id='backup_database',
+            max_instances=1,
+            coalesce=True
+        )
+        
         self.scheduler.start()
         logger.info("Scheduler started")
         
@@ -67,3 +86,61 @@ class BotScheduler:
             logger.info("Accounts closed for receiving")
         except Exception as e:
             logger.error(f"Error closing accounts: {e}")
+            
+    async def backup_database(self) -> Optional[Dict]:
+        """Take an online, verified and compressed database backup"""
+        started = timer.monotonic()
+        os.makedirs(self.config.BACKUP_DIR, exist_ok=True)
+        
+        base_name = os.path.splitext(os.path.basename(self.config.DATABASE_NAME))[0].strip(':') or 'database'
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        raw_path = os.path.join(self.config.BACKUP_DIR, f"{base_name}_{stamp}.db")
+        
+        try:
+            # Copy a few pages at a time so handlers can keep writing meanwhile
+            await self.database.snapshot_to(raw_path, pages=self.config.BACKUP_PAGES_PER_STEP)
+            
+            if not await Database(raw_path).integrity_check():
+                logger.error(f"Backup {raw_path} failed integrity check, discarding it")
+                os.remove(raw_path)
+                return None
+            
+            archive_path = await asyncio.to_thread(self._compress_backup, raw_path)
+            self._rotate_backups(base_name)
+            
+            self.last_backup = {
+                "path": archive_path,
+                "size": os.path.getsize(archive_path),
+                "duration": timer.monotonic() - started,
+                "created_at": stamp,
+            }
+            logger.info(
+                f"Database backup {archive_path} written "
+                f"({self.last_backup['size']} bytes in {self.last_backup['duration']:.2f}s)"
+            )
+            return self.last_backup
+            
+        except Exception as e:
+            logger.error(f"Error backing up database: {e}")
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+            return None
+            
+    @staticmethod
+    def _compress_backup(raw_path: str) -> str:
+        """Gzip a backup file and remove the uncompressed copy"""
+        archive_path = f"{raw_path}.gz"
+        with open(raw_path, 'rb') as source, gzip.open(archive_path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        os.remove(raw_path)
+        return archive_path
+        
+    def _rotate_backups(self, base_name: str):
+        """Keep only the newest BACKUP_KEEP compressed backups"""
+        pattern = os.path.join(self.config.BACKUP_DIR, f"{base_name}_*.db.gz")
+        backups = sorted(glob.glob(pattern))
+        for old_backup in backups[:-max(self.config.BACKUP_KEEP, 1)]:
+            try:
+                os.remove(old_backup)
+            except OSError as e:
+                logger.error(f"Error removing old backup {old_backup}: {e}")
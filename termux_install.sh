@@ -80,5 +80,6 @@ echo "- ADMIN_ID=your_telegram_user_id"
 echo "- API_ID=your_api_id_from_my_telegram_org"
 echo "- API_HASH=your_api_hash_from_my_telegram_org"
 echo "- CHANNEL_ID=your_channel_id_for_notifications (optional)"
+echo "- LOW_MEMORY=true (optional, on by default with run_termux.py)"
 echo ""
 echo "🚀 Happy trading!"
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Per-user and global request throttling for the dispatcher
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from config import Config
+from utils import extract_command
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, now: float, amount: float = 1.0) -> bool:
+        """Take ``amount`` tokens if available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+class ExpiringDict:
+    """Bounded mapping whose entries expire after ``ttl`` seconds without use"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key, now: float):
+        """Return a live value and refresh its expiry, or None"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] > self.ttl:
+            del self._data[key]
+            return None
+        self._data[key] = (now, entry[1])
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value, now: float):
+        """Store a value, evicting expired and least recently used entries"""
+        self._data[key] = (now, value)
+        self._data.move_to_end(key)
+        # Entries are kept in last-used order, so expired ones sit at the front
+        while self._data:
+            oldest_key, (used, _) = next(iter(self._data.items()))
+            if now - used <= self.ttl and len(self._data) <= self.max_size:
+                break
+            del self._data[oldest_key]
+
+    def __len__(self):
+        return len(self._data)
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer middleware that drops updates from users who exceed their rate"""
+
+    THROTTLED_REPLY = "⏳ Kana aika saƙonni da sauri. Don Allah ka jira kaɗan ka sake gwadawa."
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.user_rate = config.THROTTLE_RATE
+        self.user_burst = config.THROTTLE_BURST
+        self.command_limits = config.THROTTLE_COMMAND_LIMITS
+        self.global_bucket = TokenBucket(config.THROTTLE_GLOBAL_RATE, config.THROTTLE_GLOBAL_BURST)
+        self.buckets = ExpiringDict(config.THROTTLE_MAX_USERS, config.THROTTLE_IDLE_TTL)
+        # Users already told they are throttled; refreshed while they keep flooding
+        self.notified = ExpiringDict(config.THROTTLE_MAX_USERS, config.THROTTLE_NOTIFY_INTERVAL)
+        self.counters = {"allowed": 0, "throttled_user": 0, "throttled_global": 0, "replies": 0}
+        self.command_counters: Dict[str, int] = {}
+
+    @staticmethod
+    def _command_of(event: TelegramObject) -> Optional[str]:
+        """Extract the bot command name from a message, if any"""
+        if not isinstance(event, Message):
+            return None
+        return extract_command(event.text or event.caption)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or self.config.is_admin(user.id):
+            return await handler(event, data)
+
+        now = time.monotonic()
+        command = self._command_of(getattr(event, "message", None) or event)
+        key = (user.id, command if command in self.command_limits else None)
+
+        bucket = self.buckets.get(key, now)
+        if bucket is None:
+            rate, burst = self.command_limits.get(command, (self.user_rate, self.user_burst))
+            bucket = TokenBucket(rate, burst)
+            self.buckets.set(key, bucket, now)
+
+        if not bucket.consume(now):
+            self.counters["throttled_user"] += 1
+            if command:
+                self.command_counters[command] = self.command_counters.get(command, 0) + 1
+            await self._reply_throttled(event, user.id, now)
+            return None
+
+        if not self.global_bucket.consume(now):
+            self.counters["throttled_global"] += 1
+            await self._reply_throttled(event, user.id, now)
+            return None
+
+        self.counters["allowed"] += 1
+        return await handler(event, data)
+
+    async def _reply_throttled(self, event: TelegramObject, user_id: int, now: float):
+        """Answer a throttled user once until they stop flooding for the notify interval"""
+        message = getattr(event, "message", None) or event
+        if not isinstance(message, Message) or self.notified.get(user_id, now):
+            return
+        self.notified.set(user_id, True, now)
+        self.counters["replies"] += 1
+        try:
+            await message.answer(self.THROTTLED_REPLY)
+        except Exception as e:
+            logger.error(f"Error sending throttle reply to {user_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of throttle counters for the admin"""
+        return {
+            **self.counters,
+            "tracked_buckets": len(self.buckets),
+            "by_command": dict(self.command_counters),
+        }
@@ -0,0 +1,169 @@
+"""
+Per-user ordered update execution with cross-user parallelism and priority lanes
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from config import Config
+from utils import extract_command
+
+logger = logging.getLogger(__name__)
+
+HIGH_LANE = "high"
+NORMAL_LANE = "normal"
+LOW_LANE = "low"
+
+class _UserQueue:
+    """FIFO lane for one user's updates"""
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        # asyncio.Lock wakes waiters in the order they started waiting
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+class _Lane:
+    """Concurrency slots and queue-wait statistics for one priority lane"""
+
+    def __init__(self, concurrency: int, max_pending: Optional[int] = None):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.processed = 0
+        self.dropped = 0
+        self.max_wait = 0.0
+        self.waits = deque(maxlen=500)
+
+    def record_wait(self, wait: float):
+        self.processed += 1
+        self.max_wait = max(self.max_wait, wait)
+        self.waits.append(wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.waits)
+        def percentile(fraction: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+        return {
+            "pending": self.pending,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "wait_p50_ms": percentile(0.50),
+            "wait_p95_ms": percentile(0.95),
+            "wait_max_ms": self.max_wait * 1000,
+        }
+
+class UpdateScheduler(BaseMiddleware):
+    """Outer update middleware that serializes each user's updates.
+
+    Polling runs every update as its own task. This middleware makes a
+    user's updates run one at a time in arrival order, while updates from
+    different users run in parallel. A user's queue holds at most
+    ``UPDATE_USER_QUEUE`` updates and is discarded once it drains. The
+    admin's own commands (``ADMIN_COMMANDS``) are stateless and skip this
+    ordering. Anything else the admin sends, such as an account submission
+    or a withdrawal, is serialized like any other user's updates.
+
+    Updates are also sorted into priority lanes, each with its own
+    concurrency slots. The admin's payment and other commands use the high
+    lane, whose slots are reserved so user traffic cannot starve them. The
+    admin's reports use a small, bounded low lane. Everything from other
+    users goes through the normal lane.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.max_queue = config.UPDATE_USER_QUEUE
+        self.admin_commands = config.ADMIN_COMMANDS
+        self.low_commands = config.LOW_PRIORITY_COMMANDS
+        self.lanes = {
+            HIGH_LANE: _Lane(config.UPDATE_HIGH_CONCURRENCY),
+            NORMAL_LANE: _Lane(config.UPDATE_CONCURRENCY),
+            LOW_LANE: _Lane(config.UPDATE_LOW_CONCURRENCY, config.UPDATE_LOW_QUEUE),
+        }
+        self._users: Dict[int, _UserQueue] = {}
+        self.dropped_user_queue = 0
+
+    @staticmethod
+    def _command_of(event: TelegramObject) -> Optional[str]:
+        message = getattr(event, "message", None) or event
+        return extract_command(message.text or message.caption) if isinstance(message, Message) else None
+
+    def _lane_for(self, command: Optional[str], is_admin: bool) -> str:
+        """Pick the priority lane for an update"""
+        # Non-admins sending admin commands are rejected by the handlers, so
+        # they must not take reserved slots or fill the bounded report lane
+        if not is_admin:
+            return NORMAL_LANE
+        return LOW_LANE if command in self.low_commands else HIGH_LANE
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        arrived = time.monotonic()
+        user = data.get("event_from_user")
+        command = self._command_of(event)
+        is_admin = user is not None and self.config.is_admin(user.id)
+        lane = self.lanes[self._lane_for(command, is_admin)]
+
+        if lane.max_pending is not None and lane.pending >= lane.max_pending:
+            lane.dropped += 1
+            logger.warning("Dropping low-priority update: lane full")
+            return None
+
+        # Admin commands are stateless, so they skip per-user ordering and a
+        # long report can never hold up a /mark_paid behind it
+        if user is None or (is_admin and command in self.admin_commands):
+            lane.pending += 1
+            try:
+                async with lane.slots:
+                    lane.record_wait(time.monotonic() - arrived)
+                    return await handler(event, data)
+            finally:
+                lane.pending -= 1
+
+        queue = self._users.get(user.id)
+        if queue is None:
+            queue = self._users[user.id] = _UserQueue()
+        if queue.pending >= self.max_queue:
+            self.dropped_user_queue += 1
+            logger.warning(f"Dropping update from user {user.id}: queue full")
+            return None
+
+        queue.pending += 1
+        lane.pending += 1
+        try:
+            async with queue.lock:
+                # FSM state was read before we queued; reload it now that earlier
+                # updates from this user have finished
+                if "state" in data:
+                    data["raw_state"] = await data["state"].get_state()
+                async with lane.slots:
+                    lane.record_wait(time.monotonic() - arrived)
+                    return await handler(event, data)
+        finally:
+            lane.pending -= 1
+            queue.pending -= 1
+            if queue.pending == 0:
+                self._users.pop(user.id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of scheduler counters and per-lane queue waits"""
+        return {
+            "active_users": len(self._users),
+            "queued": sum(queue.pending for queue in self._users.values()),
+            "dropped_user_queue": self.dropped_user_queue,
+            "lanes": {name: lane.get_stats() for name, lane in self.lanes.items()},
+        }
@@ -4,6 +4,7 @@ Utility functions
 
 import re
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +51,15 @@ def validate_otp(otp: str) -> bool:
     """Validate OTP format"""
     return bool(re.match(r'^\d{5}$', otp.strip()))
 
+def extract_command(text: Optional[str]) -> Optional[str]:
+    """Extract the bot command name (without / and @botname) from message text"""
+    if not text or not text.startswith('/'):
+        return None
+    parts = text[1:].split(maxsplit=1)
+    if not parts:
+        return None
+    return parts[0].split('@', 1)[0].lower() or None
+
 def extract_country_from_phone(phone: str) -> str:
     """Extract country from phone number"""
     # Simple country mapping based on country code